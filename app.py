@@ -548,6 +548,20 @@ def event_channel_deleted(logger: logging.Logger, event: dict, body: dict):
     utils.generic_event_proxy(logger, event, body)
 
 
+@slack_app.event(c.EVENT_CHANNEL_LEFT)
+def event_channel_left(logger: logging.Logger, event: dict):
+    # bot was removed, don't keep reporting it as a member
+    utils.invalidate_membership_cache(event["channel"])
+
+
+@slack_app.event(c.EVENT_GROUP_LEFT)
+def event_group_left(logger: logging.Logger, event: dict):
+    # private channel version of channel_left. Slack only sends it with groups:read, which the manifest
+    # doesn't ask for - but without that scope conversations.info can't report a private channel as
+    # is_member either, so nothing private ends up in the membership cache to go stale
+    utils.invalidate_membership_cache(event["channel"])
+
+
 @slack_app.event(c.EVENT_CHANNEL_UNARCHIVE)
 def event_channel_unarchive(logger: logging.Logger, event: dict, body: dict):
     utils.generic_event_proxy(logger, event, body)
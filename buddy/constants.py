@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 URLS: Dict[str, Any] = {
     "images": {
@@ -23,7 +23,9 @@ EVENT_APP_MENTION = "app_mention"
 EVENT_CHANNEL_ARCHIVE = "channel_archive"
 EVENT_CHANNEL_CREATED = "channel_created"
 EVENT_CHANNEL_DELETED = "channel_deleted"
+EVENT_CHANNEL_LEFT = "channel_left"
 EVENT_CHANNEL_UNARCHIVE = "channel_unarchive"
+EVENT_GROUP_LEFT = "group_left"
 EVENT_REACTION_ADDED = "reaction_added"
 EVENT_WORKFLOW_PUBLISHED = "workflow_published"
 EVENT_WORKFLOW_STEP_DELETED = "workflow_step_deleted"
@@ -43,7 +45,8 @@ WAIT_STATE_MAX_SECONDS = 60
 
 BUDDY_VALUE_DELIMITER = "|+|"
 
-APP_HOME_HEADER_BLOCKS: List[Dict[str, Any]] = [
+# tuples so nobody mutates them in place - copy with list(...) before extending
+APP_HOME_HEADER_BLOCKS: Tuple[Dict[str, Any], ...] = (
     {
         "type": "header",
         "text": {"type": "plain_text", "text": "Workflow Buddy", "emoji": True},
@@ -138,9 +141,9 @@ APP_HOME_HEADER_BLOCKS: List[Dict[str, Any]] = [
         ],
     },
     # {"type": "divider"},
-]
+)
 
-APP_HOME_MIDDLE_BLOCKS: List[Dict[str, Any]] = [
+APP_HOME_MIDDLE_BLOCKS: Tuple[Dict[str, Any], ...] = (
     {"type": "section", "text": {"type": "mrkdwn", "text": "  "}},
     {"type": "section", "text": {"type": "plain_text", "text": "    "}},
     {"type": "section", "text": {"type": "plain_text", "text": "    "}},
@@ -230,7 +233,7 @@ APP_HOME_MIDDLE_BLOCKS: List[Dict[str, Any]] = [
         ],
     },
     {"type": "divider"},
-]
+)
 
 UTILS_ACTION_LABELS: Dict[str, str] = {
     "webhook": "Send a Webhook",
@@ -1,20 +1,30 @@
+import atexit
+import concurrent.futures
 import contextlib
-import copy
+import functools
 import http
+import http.cookiejar
 import json
 import logging
+import mmap
 import os
 import random
 import re
 import shelve
+import shutil
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 from urllib import parse, response
 
+import orjson
 import requests
 import slack_sdk
 import slack_sdk.errors
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import buddy.constants as c
 
@@ -25,37 +35,108 @@ WB_DATA_DIR = os.getenv("WB_DATA_DIR") or (
     "./workflow-buddy-test/" if ENV == "TEST" else "/usr/app/data/"
 )
 logging.info(f"ENV: {ENV} WB_DATA_DIR:{WB_DATA_DIR}")
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+SLACK_USER_TOKEN = os.getenv("SLACK_USER_TOKEN")
 
 
 Path(WB_DATA_DIR).mkdir(parents=True, exist_ok=True)
 PERSISTED_JSON_FILE = f"{WB_DATA_DIR}/workflow-buddy-db.json"
 Path(PERSISTED_JSON_FILE).touch()
+# every mutation is appended here as one line, and folded back into PERSISTED_JSON_FILE once it grows
+PERSISTED_OPLOG_FILE = f"{WB_DATA_DIR}/workflow-buddy-db.log"
+# log being folded into a new snapshot - only left behind if compaction didn't finish
+PERSISTED_OPLOG_COMPACTING_FILE = f"{PERSISTED_OPLOG_FILE}.old"
 logging.info(f"Using DB file path: {PERSISTED_JSON_FILE}...")
 
 # !! THIS ONLY WORKS IF YOU HAVE A SINGLE PROCESS
 IN_MEMORY_WRITE_THROUGH_CACHE: Dict[str, List] = {}
-# on startup, load current contents into cache
-with open(PERSISTED_JSON_FILE, "r") as jf:
+# on startup, load current contents into cache - the op log is replayed on top further down
+with open(PERSISTED_JSON_FILE, "rb") as jf:
     try:
-
-        IN_MEMORY_WRITE_THROUGH_CACHE = json.load(jf)
+        # map the file and parse straight from the page cache, skipping the read() copy
+        with mmap.mmap(jf.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(
+            mm
+        ) as view:
+            IN_MEMORY_WRITE_THROUGH_CACHE = orjson.loads(view)
         logging.info("Cache loaded from file")
-    except json.decoder.JSONDecodeError as e:
+    except (orjson.JSONDecodeError, ValueError) as e:
+        # mmap raises ValueError for an empty file
         logging.warning("Unable to load from file, starting empty cache.")
         IN_MEMORY_WRITE_THROUGH_CACHE = {}
-logging.info(f"Starting DB: {IN_MEMORY_WRITE_THROUGH_CACHE}")
+
+# a background thread checks the op log at most once per debounce window, and compacts it past the threshold
+WB_FLUSH_DEBOUNCE_MS = int(os.getenv("WB_FLUSH_DEBOUNCE_MS") or 250)
+WB_OPLOG_COMPACT_BYTES = int(os.getenv("WB_OPLOG_COMPACT_BYTES") or 1024 * 1024)
+WB_OPLOG_FSYNC = os.getenv("WB_OPLOG_FSYNC") == "true"
+_dirty = threading.Event()
+_flush_lock = threading.Lock()
+_compaction_lock = threading.Lock()
+# bumped on every mutation, so anything rendered from the DB knows when it's stale
+_DB_VERSION = 0
+_app_home_body_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+
+# shared so repeat webhooks to the same host (mostly hooks.slack.com) reuse keep-alive connections.
+# POST isn't in Retry's default allowed_methods, so a workflow won't get triggered twice on a 5xx,
+# and once retries run out callers still get the last response back rather than an exception.
+_HTTP = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=[429, 502, 503, 504],
+        raise_on_status=False,
+    ),
+)
+_HTTP.mount("https://", _HTTP_ADAPTER)
+_HTTP.mount("http://", _HTTP_ADAPTER)
+# the session is shared across every user's webhooks, so never keep cookies one server set for the next request
+_HTTP.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+# shared read-only defaults, never mutate these
+_DEFAULT_BLOCKS: tuple = ()
+_JSON_HEADERS = {"Content-Type": "application/json"}
+# an event can fan out to many workflows, send them all at once instead of one RTT after another
+_WEBHOOK_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=16, thread_name_prefix="wh"
+)
+
+# whether a user is a bot doesn't change, so remember it per (token, user_id) instead of asking Slack every time.
+# WebClient.token is Optional, so the key is too
+_USER_IS_BOT_CACHE: Dict[Tuple[Optional[str], str], bool] = {}
+_USER_IS_BOT_CACHE_MAX_SIZE = 4096
+
+# conversation_id -> when the bot was last seen as a member. Only "is_member" is cached - the other answers
+# change the moment someone invites the bot, and that's exactly when users resubmit the form.
+MEMBERSHIP_CACHE_TTL_SECONDS = 300
+_MEMBERSHIP_CACHE_MAX_SIZE = 1024
+_membership_cache: Dict[str, float] = {}
+
+# Channel names may only contain lowercase letters, numbers, hyphens, underscores and be max 80 chars.
+# \Z rather than $, which would also accept a trailing newline
+_SLACK_CHANNEL_RE = re.compile(r"[a-z0-9_-]{1,80}\Z")
+_RE_WF_VAR = re.compile(r"\{\{[^}]*==[^}]*\}\}")
+_STR_LEN_RE = re.compile(r"str_length-(\d+)\Z")
 
 
 ###################
 # Utils
 ###################
-def get_block_kit_builder_link(type="home", view=None, blocks=[]) -> str:
+@functools.lru_cache(maxsize=None)
+def _slack_client(token: Optional[str]) -> slack_sdk.WebClient:
+    # one client per token instead of constructing a new one per call. WebClient opens a fresh urllib
+    # connection for every API request either way, so this only saves the client setup, not any handshakes
+    return slack_sdk.WebClient(token=token)
+
+
+def get_block_kit_builder_link(type="home", view=None, blocks=None) -> str:
     block_kit_base_url = "https://app.slack.com/block-kit-builder/"
     payload = view
     if view is None:
-        payload = {"type": type, "blocks": blocks}
-    json_str = json.dumps(payload)
-    return parse.quote(f"{block_kit_base_url}#{json_str}", safe="/:?=&#")
+        payload = {"type": type, "blocks": blocks or _DEFAULT_BLOCKS}
+    # base url is all safe chars already, so only the JSON needs quoting - straight from orjson's bytes
+    quoted_json = parse.quote_from_bytes(orjson.dumps(payload), safe="/:?=&#")
+    return f"{block_kit_base_url}#{quoted_json}"
 
 
 # TODO: accept any of the keyword args that are allowed?
@@ -70,6 +151,7 @@ def generic_event_proxy(logger: logging.Logger, event: dict, body: dict) -> None
         db_set_unhandled_event(event_type)
         return
 
+    pending = []
     for webhook_config in workflow_webhooks_to_request:
         should_filter_reason = should_filter_event(webhook_config, event)
         if should_filter_reason:
@@ -80,7 +162,17 @@ def generic_event_proxy(logger: logging.Logger, event: dict, body: dict) -> None
             json_body = event
         else:
             json_body = flatten_payload_for_slack_workflow_builder(event)
-        resp = send_webhook(webhook_config["webhook_url"], json_body)
+        fut = _WEBHOOK_POOL.submit(
+            send_webhook, webhook_config["webhook_url"], json_body
+        )
+        pending.append((fut, webhook_config))
+
+    for fut, webhook_config in pending:
+        try:
+            resp = fut.result()
+        except requests.RequestException as e:
+            logger.error(f"Failed to send webhook: {e}|config:{webhook_config}")
+            continue
         if resp.status_code >= 300:
             logger.error(f"{resp.status_code}:{resp.text}|config:{webhook_config}")
     logger.info("Finished sending all webhooks for event")
@@ -91,10 +183,11 @@ def send_webhook(
     body: dict,
     method="POST",
     params=None,
-    headers={"Content-Type": "application/json"},
+    headers=None,
 ) -> requests.Response:
+    headers = headers or _JSON_HEADERS
     logging.debug(f"Method:{method}. body to send:{body}")
-    resp = requests.request(
+    resp = _HTTP.request(
         method=method, url=url, json=body, params=params, headers=headers
     )
     logging.info(f"{resp.status_code}: {resp.text}")
@@ -109,32 +202,158 @@ def db_get_unhandled_events() -> List[str]:
 
 
 def db_remove_unhandled_event(event_type) -> None:
+    # called for every handled event, so skip the list scan when it was never unhandled
+    if event_type not in _UNHANDLED_SEEN:
+        return
+    _UNHANDLED_SEEN.discard(event_type)
     with contextlib.suppress(ValueError, KeyError):
-        IN_MEMORY_WRITE_THROUGH_CACHE[c.DB_UNHANDLED_EVENTS_KEY].remove(event_type)
+        curr = IN_MEMORY_WRITE_THROUGH_CACHE[c.DB_UNHANDLED_EVENTS_KEY]
+        curr.remove(event_type)
         logging.info(f"Remove unhandled event: {event_type}")
-        sync_cache_to_disk()
+        _append_oplog("put", c.DB_UNHANDLED_EVENTS_KEY, curr)
 
 
 def db_set_unhandled_event(event_type) -> None:
+    if event_type in _UNHANDLED_SEEN:
+        return
     logging.info(f"Adding unhandled event: {event_type}")
-    try:
-        curr = IN_MEMORY_WRITE_THROUGH_CACHE[c.DB_UNHANDLED_EVENTS_KEY]
-        curr.append(event_type)
-        IN_MEMORY_WRITE_THROUGH_CACHE[c.DB_UNHANDLED_EVENTS_KEY] = list(set(curr))
-    except KeyError:
-        IN_MEMORY_WRITE_THROUGH_CACHE[c.DB_UNHANDLED_EVENTS_KEY] = [event_type]
-    sync_cache_to_disk()
+    _UNHANDLED_SEEN.add(event_type)
+    curr = IN_MEMORY_WRITE_THROUGH_CACHE.setdefault(c.DB_UNHANDLED_EVENTS_KEY, [])
+    curr.append(event_type)
+    _append_oplog("put", c.DB_UNHANDLED_EVENTS_KEY, curr)
 
 
 def db_get_event_config(event_type) -> List[Dict[str, Any]]:
     return IN_MEMORY_WRITE_THROUGH_CACHE[event_type]
 
 
+def _apply_op(op: str, key: str, value: Any = None) -> None:
+    if op == "put":
+        IN_MEMORY_WRITE_THROUGH_CACHE[key] = value
+    elif op == "del":
+        IN_MEMORY_WRITE_THROUGH_CACHE.pop(key, None)
+
+
+def _replay_oplog(path: str) -> int:
+    # puts always carry the full value for a key, so replaying an op that's already in the snapshot is harmless
+    count = 0
+    with contextlib.suppress(FileNotFoundError), open(path, "rb") as lf:
+        for line in lf:
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # most likely a torn last line from a crash mid-append
+                logging.warning(f"Skipping unreadable op log line: {line!r}")
+                continue
+            _apply_op(entry["op"], entry["k"], entry.get("v"))
+            count += 1
+    return count
+
+
+def _repair_torn_oplog_tail(path: str) -> None:
+    # a crash mid-append can leave a partial last line, and the next append would get glued onto it
+    # and be skipped on replay - cut the log back to the end of its last complete line
+    with contextlib.suppress(FileNotFoundError), open(path, "r+b") as lf:
+        end = lf.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            chunk_start = max(0, pos - 4096)
+            lf.seek(chunk_start)
+            chunk = lf.read(pos - chunk_start)
+            if pos == end and chunk.endswith(b"\n"):
+                return
+            newline_at = chunk.rfind(b"\n")
+            if newline_at != -1:
+                pos = chunk_start + newline_at + 1
+                break
+            pos = chunk_start
+        if pos != end:
+            logging.warning(f"Truncating torn op log tail in {path} at byte {pos}")
+            lf.truncate(pos)
+
+
+def _append_oplog(op: str, key: str, value: Any = None) -> None:
+    global _DB_VERSION
+    entry: Dict[str, Any] = {"op": op, "k": key}
+    if op == "put":
+        entry["v"] = value
+    with _flush_lock:
+        # serialized under the lock - values are live lists, so two writers to the same key
+        # have to land in the log in the same order they saw the list
+        line = orjson.dumps(entry) + b"\n"
+        _DB_VERSION += 1
+        _oplog_fp.write(line)
+        _oplog_fp.flush()
+        if WB_OPLOG_FSYNC:
+            os.fsync(_oplog_fp.fileno())
+    _dirty.set()
+
+
+def _rotate_oplog() -> None:
+    # caller holds _flush_lock
+    global _oplog_fp
+    _oplog_fp.close()
+    if os.path.exists(PERSISTED_OPLOG_COMPACTING_FILE):
+        # a previous compaction didn't finish, keep its ops around until one does
+        with open(PERSISTED_OPLOG_COMPACTING_FILE, "ab") as old_fp, open(
+            PERSISTED_OPLOG_FILE, "rb"
+        ) as curr_fp:
+            shutil.copyfileobj(curr_fp, old_fp)
+        os.remove(PERSISTED_OPLOG_FILE)
+    else:
+        os.replace(PERSISTED_OPLOG_FILE, PERSISTED_OPLOG_COMPACTING_FILE)
+    _oplog_fp = open(PERSISTED_OPLOG_FILE, "ab")
+
+
 def sync_cache_to_disk() -> None:
-    logging.debug(f"Syncing cache to disk - {IN_MEMORY_WRITE_THROUGH_CACHE}")
-    json_str = json.dumps(IN_MEMORY_WRITE_THROUGH_CACHE, indent=2)
-    with open(PERSISTED_JSON_FILE, "w") as jf:
-        jf.write(json_str)
+    # compaction: write the whole cache as the new snapshot, then drop the log entries it now contains
+    with _compaction_lock:
+        # only hold the lock for the copy + log swap, mutations keep appending to the fresh log
+        # while we serialize. Values are lists that get appended to or replaced, never edited in place.
+        # The db_* helpers change the dict before taking _flush_lock, so iterate over a copy -
+        # dict.copy() is atomic under the GIL, .items() on the live dict can see it change size.
+        with _flush_lock:
+            snapshot = {
+                k: list(v) if isinstance(v, list) else v
+                for k, v in IN_MEMORY_WRITE_THROUGH_CACHE.copy().items()
+            }
+            _rotate_oplog()
+
+        # the full DB is already logged at startup, don't build another copy of it as a str here
+        logging.debug(f"Syncing cache to disk - {len(snapshot)} keys")
+        # write next to the DB and swap it in, so a crash mid-write can't leave a half-written file
+        tmp_file = f"{PERSISTED_JSON_FILE}.tmp"
+        # orjson hands back bytes, no str to encode - and a write this big bypasses the file buffer
+        with open(tmp_file, "wb") as jf:
+            jf.write(orjson.dumps(snapshot, option=orjson.OPT_INDENT_2))
+            jf.flush()
+            os.fsync(jf.fileno())
+        os.replace(tmp_file, PERSISTED_JSON_FILE)
+        dir_fd = os.open(WB_DATA_DIR, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        os.remove(PERSISTED_OPLOG_COMPACTING_FILE)
+
+
+def _compaction_worker() -> None:
+    while True:
+        _dirty.wait()
+        # let the rest of a burst of mutations land before checking the log size
+        time.sleep(WB_FLUSH_DEBOUNCE_MS / 1000)
+        _dirty.clear()
+        try:
+            if os.path.getsize(PERSISTED_OPLOG_FILE) > WB_OPLOG_COMPACT_BYTES:
+                sync_cache_to_disk()
+        except Exception:
+            # anything escaping here would kill the thread, and the log would never be compacted again
+            logging.exception("Failed to compact op log")
+
+
+def _close_oplog() -> None:
+    with _flush_lock:
+        _oplog_fp.close()
 
 
 def db_add_webhook_to_event(
@@ -147,25 +366,42 @@ def db_add_webhook_to_event(
         IN_MEMORY_WRITE_THROUGH_CACHE[event_type].append(new_webhook)
     except KeyError:
         IN_MEMORY_WRITE_THROUGH_CACHE[event_type] = [new_webhook]
-    sync_cache_to_disk()
+    _append_oplog("put", event_type, IN_MEMORY_WRITE_THROUGH_CACHE[event_type])
 
 
 def db_remove_event(event_type) -> None:
     try:
         del IN_MEMORY_WRITE_THROUGH_CACHE[event_type]
-        sync_cache_to_disk()
+        _append_oplog("del", event_type)
     except KeyError:
         logging.info("Key doesnt exist to delete")
 
 
 def db_import(new_data) -> int:
     count = len(new_data.keys())
+    global _UNHANDLED_SEEN
     for k, v in new_data.items():
         IN_MEMORY_WRITE_THROUGH_CACHE[k] = v
-    sync_cache_to_disk()
+        _append_oplog("put", k, v)
+    _UNHANDLED_SEEN = set(db_get_unhandled_events())
     return count
 
 
+# replay anything logged since the last compaction, then keep the log open for appends
+_repair_torn_oplog_tail(PERSISTED_OPLOG_COMPACTING_FILE)
+_repair_torn_oplog_tail(PERSISTED_OPLOG_FILE)
+_replayed_ops = _replay_oplog(PERSISTED_OPLOG_COMPACTING_FILE) + _replay_oplog(
+    PERSISTED_OPLOG_FILE
+)
+logging.info(f"Replayed {_replayed_ops} ops from {PERSISTED_OPLOG_FILE}")
+logging.info(f"Starting DB: {IN_MEMORY_WRITE_THROUGH_CACHE}")
+# mirrors the unhandled events list, so the per-event checks in generic_event_proxy are O(1)
+_UNHANDLED_SEEN: Set[str] = set(db_get_unhandled_events())
+_oplog_fp = open(PERSISTED_OPLOG_FILE, "ab")
+threading.Thread(target=_compaction_worker, name="wb-db-compact", daemon=True).start()
+atexit.register(_close_oplog)
+
+
 def db_export() -> dict:
     return IN_MEMORY_WRITE_THROUGH_CACHE
 
@@ -178,11 +414,22 @@ def update_app_home(client, user_id, view=None) -> None:
 
 
 def build_app_home_view() -> dict:
+    global _app_home_body_cache
+    db_version = _DB_VERSION
+    if _app_home_body_cache is None or _app_home_body_cache[0] != db_version:
+        _app_home_body_cache = (db_version, _build_app_home_body_blocks())
+    # footer image is picked at random per render, so it stays out of the cached blocks
+    blocks = _app_home_body_cache[1] + _build_app_home_footer_blocks()
+    return {"type": "home", "blocks": blocks}
+
+
+def _build_app_home_body_blocks() -> List[Dict[str, Any]]:
     data = db_export()
     curr_events = list(data.keys())
     with contextlib.suppress(ValueError):
         curr_events.remove(c.DB_UNHANDLED_EVENTS_KEY)
-    blocks = copy.deepcopy(c.APP_HOME_HEADER_BLOCKS)
+    # only the outer list gets extended, the static blocks themselves are never mutated
+    blocks = list(c.APP_HOME_HEADER_BLOCKS)
     unhandled_events = db_get_unhandled_events()
     if len(unhandled_events) > 0:
         blocks.extend(
@@ -217,36 +464,41 @@ def build_app_home_view() -> dict:
     for event_type, webhook_list in data.items():
         if event_type == c.DB_UNHANDLED_EVENTS_KEY:
             continue
-        single_event_row: List[Dict[str, Any]] = [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f":black_small_square: `{event_type}`",
-                },
-                "accessory": {
-                    "type": "button",
-                    "text": {"type": "plain_text", "text": "Delete", "emoji": True},
-                    "style": "danger",
-                    "value": f"{event_type}",
-                    "action_id": "event_delete_clicked",
-                },
-            },
-            {
-                "type": "context",
-                "elements": [
-                    {
-                        "type": "plain_text",
-                        "text": f"--> {str(webhook_list)}",
-                        "emoji": True,
-                    }
-                ],
-            },
-        ]
-        blocks.extend(single_event_row)
+        blocks.extend(_build_app_home_event_row(event_type, webhook_list))
 
     blocks.extend(c.APP_HOME_MIDDLE_BLOCKS)
+    return blocks
+
+
+# static part of every event row, shared rather than rebuilt per row - Slack only reads it
+_DELETE_BUTTON_TEXT = {"type": "plain_text", "text": "Delete", "emoji": True}
 
+
+def _build_app_home_event_row(
+    event_type: str, webhook_list: List[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    return (
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": f":black_small_square: `{event_type}`"},
+            "accessory": {
+                "type": "button",
+                "text": _DELETE_BUTTON_TEXT,
+                "style": "danger",
+                "value": event_type,
+                "action_id": "event_delete_clicked",
+            },
+        },
+        {
+            "type": "context",
+            "elements": [
+                {"type": "plain_text", "text": f"--> {webhook_list}", "emoji": True}
+            ],
+        },
+    )
+
+
+def _build_app_home_footer_blocks() -> List[Dict[str, Any]]:
     footer_blocks: List[Dict[str, Any]] = [
         {"type": "divider"},
         {
@@ -269,8 +521,7 @@ def build_app_home_view() -> dict:
     footer_blocks.insert(
         0, {"type": "image", "image_url": footer_image_url, "alt_text": "happybara.io"}
     )
-    blocks.extend(footer_blocks)
-    return {"type": "home", "blocks": blocks}
+    return footer_blocks
 
 
 def test_if_bot_is_member(conversation_id: str, client: slack_sdk.WebClient) -> str:
@@ -294,6 +545,29 @@ def test_if_bot_is_member(conversation_id: str, client: slack_sdk.WebClient) ->
         return "unable_to_test"
 
 
+def cached_test_if_bot_is_member(
+    conversation_id: str, client: slack_sdk.WebClient
+) -> str:
+    # one .get() - invalidate_membership_cache or the size cap can drop the key from another thread
+    checked_at = _membership_cache.get(conversation_id)
+    if (
+        checked_at is not None
+        and time.monotonic() - checked_at < MEMBERSHIP_CACHE_TTL_SECONDS
+    ):
+        return "is_member"
+
+    status = test_if_bot_is_member(conversation_id, client)
+    if status == "is_member":
+        if len(_membership_cache) >= _MEMBERSHIP_CACHE_MAX_SIZE:
+            _membership_cache.clear()
+        _membership_cache[conversation_id] = time.monotonic()
+    return status
+
+
+def invalidate_membership_cache(conversation_id: str) -> None:
+    _membership_cache.pop(conversation_id, None)
+
+
 # TODO: use this to make UX better for if users can select conversation that we might not be able to post to
 def test_if_bot_able_to_post_to_conversation_deprecated(
     conversation_id: str, client: slack_sdk.WebClient
@@ -327,21 +601,11 @@ def test_if_bot_able_to_post_to_conversation_deprecated(
 
 
 def is_valid_slack_channel_name(channel_name: str) -> bool:
-    # Channel names may only contain lowercase letters, numbers, hyphens, underscores and be max 80 chars.
-    return bool(
-        (
-            len(channel_name) <= 80
-            and re.search(r"\d+", channel_name)
-            and re.search(r"[a-z]+", channel_name)
-            and re.search(r"[A-Z]+", channel_name)
-            and re.search(r"\W+", channel_name)
-            and not re.search(r"\s+", channel_name)
-        )
-    )
+    return _SLACK_CHANNEL_RE.match(channel_name) is not None
 
 
 def is_valid_url(url: str) -> bool:
-    return url.startswith("https://") or url.startswith("http://")
+    return url.startswith(("https://", "http://"))
 
 
 def build_add_webhook_modal():
@@ -488,9 +752,9 @@ def build_add_webhook_modal():
 def sanitize_webhook_response(resp_text: str) -> str:
     # need to make sure if we get JSON back, it's properly sanitized so it can be used downstream
     sanitized = resp_text.replace("\n", "")
-    with contextlib.suppress(json.JSONDecodeError):
+    with contextlib.suppress(orjson.JSONEncodeError):
         # make resp text usable in future webhooks/json elements
-        sanitized = json.dumps(sanitized)
+        sanitized = orjson.dumps(sanitized).decode()
         sanitized.replace('"', '\\"')
         logging.debug(f"Escaped resp is {sanitized}")
     return sanitized
@@ -504,8 +768,41 @@ def clean_json_quotes(s: str) -> str:
     return s
 
 
+def _fix_unescaped_quotes(s: str) -> str:
+    # a quote inside a string only closes it if the next non-whitespace char could follow a JSON string
+    closing_followers = ",:}]"
+    out = []
+    in_string = False
+    escape_next = False
+    n = len(s)
+    for i, ch in enumerate(s):
+        if escape_next:
+            escape_next = False
+        elif ch == "\\" and in_string:
+            escape_next = True
+        elif ch == '"':
+            if not in_string:
+                in_string = True
+            else:
+                j = i + 1
+                while j < n and s[j].isspace():
+                    j += 1
+                if j == n or s[j] in closing_followers:
+                    in_string = False
+                else:
+                    out.append("\\")
+        out.append(ch)
+    return "".join(out)
+
+
 def sanitize_unescaped_quotes_and_load_json_str(s: str, strict=False) -> dict:  # type: ignore
     # TODO: one thing this doesn't handle, is if the unescaped text includes valid JSON - then you're just out of luck
+    # orjson is strict about control characters, so anything it rejects goes through the slower stdlib path
+    with contextlib.suppress(orjson.JSONDecodeError):
+        return orjson.loads(s)
+    # single pass escaping quotes that can't be closing ones - handles most inputs without the reparse loop below
+    with contextlib.suppress(json.JSONDecodeError):
+        return json.loads(_fix_unescaped_quotes(s), strict=strict)
     js_str = s
     prev_pos = -1
     curr_pos = 0
@@ -575,36 +872,46 @@ def should_filter_event(webhook_config: dict, event: dict) -> Optional[str]:
     return should_filter_reason
 
 
+def _flatten_reaction_added(event: dict) -> dict:
+    item = event["item"]
+    return {
+        "type": event["type"],
+        "user": event["user"],
+        "reaction": event["reaction"],
+        "item_user": event["item_user"],
+        "item_type": item["type"],
+        "item_channel": item["channel"],
+        "item_ts": item["ts"],
+        "event_ts": event["event_ts"],
+    }
+
+
+def _flatten_channel_created(event: dict) -> dict:
+    channel = event["channel"]
+    return {
+        "type": event["type"],
+        "channel_id": channel["id"],
+        "channel_name": channel["name"],
+        "channel_created": str(channel["created"]),
+        "channel_creator": channel["creator"],
+    }
+
+
+# see slack limitations - 20 variables max, no nested https://slack.com/help/articles/360041352714-Create-more-advanced-workflows-using-webhooks
+# these have to match templates
+_FLATTENERS = {
+    c.EVENT_REACTION_ADDED: _flatten_reaction_added,
+    c.EVENT_CHANNEL_CREATED: _flatten_channel_created,
+}
+
+
 def flatten_payload_for_slack_workflow_builder(event):
-    # sourcery skip: lift-return-into-if, switch
     # TODO: seems like a good place to consistently add common data like team_id, etc.
-    flat_payload = {}
-    # see slack limitations - 20 variables max, no nested https://slack.com/help/articles/360041352714-Create-more-advanced-workflows-using-webhooks
-    # this has to match templates
-    et = event["type"]
-    if et == "reaction_added":
-        flat_payload = {
-            "type": et,
-            "user": event["user"],
-            "reaction": event["reaction"],
-            "item_user": event["item_user"],
-            "item_type": event["item"]["type"],
-            "item_channel": event["item"]["channel"],
-            "item_ts": event["item"]["ts"],
-            "event_ts": event["event_ts"],
-        }
-    elif et == "channel_created":
-        flat_payload = {
-            "type": et,
-            "channel_id": event["channel"]["id"],
-            "channel_name": event["channel"]["name"],
-            "channel_created": str(event["channel"]["created"]),
-            "channel_creator": event["channel"]["creator"],
-        }
-    else:
+    flattener = _FLATTENERS.get(event["type"])
+    if flattener is None:
         # TODO: gotta do this for other events, otherwise key info will be missed in nested objects
-        flat_payload = event
-    return flat_payload
+        return event
+    return flattener(event)
 
 
 def includes_slack_workflow_variable(value: Union[str, None]) -> bool:
@@ -612,8 +919,7 @@ def includes_slack_workflow_variable(value: Union[str, None]) -> bool:
     if value is None:
         return False
 
-    pattern = "^.*{{.*==.*}}.*$"
-    return re.search(pattern, value) is not None
+    return _RE_WF_VAR.search(value) is not None
 
 
 def pretty_json_error_msg(prefix: str, orig_input: str, e: json.JSONDecodeError) -> str:
@@ -626,19 +932,17 @@ def pretty_json_error_msg(prefix: str, orig_input: str, e: json.JSONDecodeError)
 def dynamic_modal_top_blocks(action_name: str):
     if action_name == "find_message":
         context_text = ""
-        try:
-            user_token = os.environ["SLACK_USER_TOKEN"]
-            client = slack_sdk.WebClient(token=user_token)
-            kwargs = {"query": "a", "count": 1}
-            resp = client.auth_test(**kwargs)
-            context_text = f"> Current authed user for search is: <@{resp.get('user_id')}>. Results will match what is visible to them. Questions? Check the <{c.URLS['github-repo']['home']}|repo for info.>"
-        except KeyError:
+        if SLACK_USER_TOKEN is None:
             context_text = f"> ❌💥 *Need a valid SLACK_USER_TOKEN secret for {c.UTILS_ACTION_LABELS[action_name]}.* ❌"
-        except slack_sdk.errors.SlackApiError as e:
-            logging.error(e.response)
-            context_text = (
-                f"> ❌💥 *Slack Error: Need a valid user token. {e.response['error']}.* ❌"
-            )
+        else:
+            try:
+                client = _slack_client(SLACK_USER_TOKEN)
+                kwargs = {"query": "a", "count": 1}
+                resp = client.auth_test(**kwargs)
+                context_text = f"> Current authed user for search is: <@{resp.get('user_id')}>. Results will match what is visible to them. Questions? Check the <{c.URLS['github-repo']['home']}|repo for info.>"
+            except slack_sdk.errors.SlackApiError as e:
+                logging.error(e.response)
+                context_text = f"> ❌💥 *Slack Error: Need a valid user token. {e.response['error']}.* ❌"
         return [
             {
                 "type": "context",
@@ -686,17 +990,23 @@ def filter_bots(client: slack_sdk.WebClient, user_list: List) -> List:
     # not sure if it can be a channel member - depends on API you're working with
     filtered = []
     for user_id in user_list:
-        resp = client.users_info(user=user_id)
-        if not resp["ok"]:
-            logging.error(resp)
-            # TODO: handle common errors better
-            continue
-
-        user: Dict[str, Any] = resp.get("user", {})
-        if user.get("is_bot") or user.get("is_workflow_bot"):
-            continue
-
-        filtered.append(user_id)
+        cache_key = (client.token, user_id)
+        is_bot = _USER_IS_BOT_CACHE.get(cache_key)
+        if is_bot is None:
+            resp = client.users_info(user=user_id)
+            if not resp["ok"]:
+                logging.error(resp)
+                # TODO: handle common errors better
+                continue
+
+            user: Dict[str, Any] = resp.get("user", {})
+            is_bot = bool(user.get("is_bot") or user.get("is_workflow_bot"))
+            if len(_USER_IS_BOT_CACHE) >= _USER_IS_BOT_CACHE_MAX_SIZE:
+                _USER_IS_BOT_CACHE.clear()
+            _USER_IS_BOT_CACHE[cache_key] = is_bot
+
+        if not is_bot:
+            filtered.append(user_id)
 
     return filtered
 
@@ -704,21 +1014,18 @@ def filter_bots(client: slack_sdk.WebClient, user_list: List) -> List:
 def sample_list_until_no_bots_are_found(
     client: slack_sdk.WebClient, members: List, number_of_users: int
 ) -> List:
-    # TODO: if bots were prefiltered, could just use sample() and avoid this whole mess.
-    # TODO: surface to users the fact that we are limiting iterations
-    # if we give back less people than they expected - use case: a channel that has more bots than people
-    max_num_allowed_iterations = 15
+    # Walk the members in random order and stop once we have enough people, so a big channel
+    # only costs a lookup per sampled user (and nothing for users we've already seen).
     no_bot_users_sample: List[str] = []
-    runs = 0
-    while (
-        len(no_bot_users_sample) < number_of_users and runs < max_num_allowed_iterations
-    ):
-        rand_user = random.choice(members)
-        if rand_user in no_bot_users_sample:
-            continue
-        filtered = filter_bots(client, [rand_user])
-        no_bot_users_sample.extend(filtered)
-    return no_bot_users_sample
+    if number_of_users <= 0:
+        return no_bot_users_sample
+    for rand_user in random.sample(members, len(members)):
+        no_bot_users_sample.extend(filter_bots(client, [rand_user]))
+        if len(no_bot_users_sample) >= number_of_users:
+            return no_bot_users_sample
+    raise ValueError(
+        f"Only found {len(no_bot_users_sample)} non-bot members, needed {number_of_users}."
+    )
 
 
 def finish_an_execution(
@@ -739,8 +1046,7 @@ def finish_step_execution_from_webhook(body: dict) -> Tuple[int, dict]:
     err_msg = ""
 
     # TODO: this WILL NOT WORK for multi-tenant app until we figure out mapping from request info to team bot tokens
-    bot_token = os.getenv("SLACK_BOT_TOKEN")
-    client = slack_sdk.WebClient(token=bot_token)
+    client = _slack_client(SLACK_BOT_TOKEN)
     execution_id = body.get("execution_id")
     if not execution_id:
         return http.HTTPStatus.BAD_REQUEST, {
@@ -770,105 +1076,192 @@ def finish_step_execution_from_webhook(body: dict) -> Tuple[int, dict]:
     return status_code, resp_body
 
 
+# how to pull the submitted value out of the modal state for each input type,
+# anything not listed is treated as a plain-text input
+_INPUT_VALUE_EXTRACTORS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "channels_select": lambda state: state["selected_channel"],
+    "conversations_select": lambda state: state["selected_conversation"],
+    "checkboxes": lambda state: orjson.dumps(state["selected_options"]).decode(),
+    "static_select": lambda state: state["selected_option"]["value"],
+}
+
+
+def _extract_plain_text_value(state: Dict[str, Any]) -> str:
+    return state["value"]
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_str_length(validation_type: str) -> Optional[int]:
+    # validation types are fixed per action config, so each one only gets parsed once
+    m = _STR_LEN_RE.match(validation_type)
+    return int(m.group(1)) if m else None
+
+
+# validators below take (value, validation_type, client, min_future_ts) and return an error message or None
+def _validate_integer(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    try:
+        _, upper_bound = validation_type.split("-")
+    except ValueError:
+        upper_bound = "100000000"
+    try:
+        v = int(value)
+        if v > int(upper_bound):
+            raise ValueError("Input is above our upper bound.")
+    except ValueError:
+        return f"Must be a valid integer and <= {upper_bound}."
+    return None
+
+
+def _validate_email(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    if "@" not in value:
+        return "Must be a valid email."
+    return None
+
+
+def _validate_url(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    if not is_valid_url(value):
+        return "Must be a valid URL with `http(s)://.`"
+    return None
+
+
+def _validate_slack_channel_name(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    if not is_valid_slack_channel_name(value):
+        return "Channel names may only contain lowercase letters, numbers, hyphens, underscores and be max 80 chars."
+    return None
+
+
+def _validate_bot_membership(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    status = cached_test_if_bot_is_member(value, client)
+    if status == "not_in_convo" or (
+        status == "not_member_but_public" and validation_type != "msg_check"
+    ):
+        return "Bot needs to be invited to the conversation before it can interact or read information about it, except for public channels."
+    return None
+
+
+def _validate_future_timestamp(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    # checked up front so a half-typed value doesn't go through int()'s exception path,
+    # isdecimal rather than isdigit since int() rejects things like superscripts
+    digits = value.strip()
+    if digits[:1] in ("-", "+"):
+        digits = digits[1:]
+    if not digits.isdecimal():
+        return f"Must be valid timestamp integer."
+    timestamp_int = int(value)
+    if timestamp_int < min_future_ts:
+        try:
+            readable_bad_dt = str(datetime.fromtimestamp(timestamp_int))
+        except (ValueError, OverflowError, OSError):
+            # too far out for the platform's datetime, the number itself still reads fine
+            readable_bad_dt = str(timestamp_int)
+        return f"Need a timestamp from > 5 mins in future, but got {readable_bad_dt}."
+    return None
+
+
+def _validate_str_length(
+    value: str,
+    validation_type: str,
+    client: slack_sdk.WebClient,
+    min_future_ts: float,
+) -> Optional[str]:
+    allowed_len = _parse_str_length(validation_type)
+    if allowed_len is None:
+        return None
+    user_input_len = len(value)
+    if user_input_len > allowed_len:
+        return f"Input must be shorter than {allowed_len}, but was {user_input_len}."
+    return None
+
+
+# keyed on the part of the validation_type before any "-", e.g. integer-200 or str_length-250
+_INPUT_VALIDATORS: Dict[
+    str, Callable[[str, str, slack_sdk.WebClient, float], Optional[str]]
+] = {
+    "integer": _validate_integer,
+    "email": _validate_email,
+    "url": _validate_url,
+    "slack_channel_name": _validate_slack_channel_name,
+    "membership_check": _validate_bot_membership,
+    "msg_check": _validate_bot_membership,
+    "future_timestamp": _validate_future_timestamp,
+    "str_length": _validate_str_length,
+}
+
+
 def parse_values_from_input_config(
-    client, values: dict, inputs: dict, curr_action_config: dict
-) -> Tuple[dict, dict]:
+    client: slack_sdk.WebClient,
+    values: Dict[str, Dict[str, Any]],
+    inputs: Dict[str, Dict[str, Any]],
+    curr_action_config: Dict[str, Any],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
     inputs = inputs
-    errors = {}
+    errors: Dict[str, str] = {}
+    # one clock read for the whole form, rather than a datetime per future_timestamp input
+    min_future_ts = time.time() + c.TIME_5_MINS
 
     for name, input_config in curr_action_config["inputs"].items():
         block_id = input_config["block_id"]
         action_id = input_config["action_id"]
-        if input_config.get("type") == "channels_select":
-            value = values[block_id][action_id]["selected_channel"]
-        elif input_config.get("type") == "conversations_select":
-            value = values[block_id][action_id]["selected_conversation"]
-        elif input_config.get("type") == "checkboxes":
-            value = json.dumps(values[block_id][action_id]["selected_options"])
-        elif input_config.get("type") == "static_select":
-            value = values[block_id][action_id]["selected_option"]["value"]
-        else:
-            # plain-text input by default
-            value = values[block_id][action_id]["value"]
-
-        validation_type = input_config.get("validation_type")
-        # have to consider that people can pass variables, which would mess with some of validation
-        value_has_workflow_variable = includes_slack_workflow_variable(value)
-        if validation_type == "json" and value:
-            value = clean_json_quotes(value)
-            try:
-                json.loads(value)
-            except json.JSONDecodeError as e:
-                errors[block_id] = f"Invalid JSON. Error: {str(e)}"
-        elif (
-            validation_type is not None
-            and validation_type.startswith("integer")
-            and not value_has_workflow_variable
-        ):
-            try:
-                validation_type, upper_bound = validation_type.split("-")
-            except ValueError:
-                upper_bound = 100000000
-            try:
-                v = int(value)
-                if v > int(upper_bound):
-                    raise ValueError("Input is above our upper bound.")
-            except ValueError:
-                errors[block_id] = f"Must be a valid integer and <= {upper_bound}."
-        elif validation_type == "email" and not value_has_workflow_variable:
-            if "@" not in value:
-                errors[block_id] = "Must be a valid email."
-        elif validation_type == "url" and not value_has_workflow_variable:
-            if not is_valid_url(value):
-                errors[block_id] = "Must be a valid URL with `http(s)://.`"
-        elif (
-            validation_type == "slack_channel_name" and not value_has_workflow_variable
-        ):
-            if not is_valid_slack_channel_name(value):
-                errors[
-                    block_id
-                ] = "Channel names may only contain lowercase letters, numbers, hyphens, underscores and be max 80 chars."
-        elif (
-            validation_type in ["membership_check", "msg_check"]
-            and not value_has_workflow_variable
-        ):
-            status = test_if_bot_is_member(value, client)
-            if status == "not_in_convo" or (
-                status == "not_member_but_public" and validation_type != "msg_check"
-            ):
-                errors[
-                    block_id
-                ] = "Bot needs to be invited to the conversation before it can interact or read information about it, except for public channels."
-        elif validation_type == "future_timestamp" and not value_has_workflow_variable:
-            try:
-                timestamp_int = int(value)
-                curr = datetime.now().timestamp()
-                if (timestamp_int - curr) < c.TIME_5_MINS:
-                    readable_bad_dt = str(datetime.fromtimestamp(timestamp_int))
-                    errors[
-                        block_id
-                    ] = f"Need a timestamp from > 5 mins in future, but got {readable_bad_dt}."
-            except ValueError:
-                errors[block_id] = f"Must be valid timestamp integer."
-        elif (
-            validation_type is not None
-            and validation_type.startswith("str_length")
-            and not value_has_workflow_variable
-        ):
-            v_type, str_len = validation_type.split("-")
-            allowed_len = int(str_len)
-            user_input_len = len(value)
-            if user_input_len > allowed_len:
-                errors[
-                    block_id
-                ] = f"Input must be shorter than {allowed_len}, but was {user_input_len}."
-
+        extract_value = _INPUT_VALUE_EXTRACTORS.get(
+            input_config.get("type"), _extract_plain_text_value
+        )
+        value = extract_value(values[block_id][action_id])
+
+        validation_type: Optional[str] = input_config.get("validation_type")
+        if validation_type == "json":
+            # json is still checked with variables in it, and the cleaned value is what gets saved
+            if value:
+                value = clean_json_quotes(value)
+                try:
+                    orjson.loads(value)
+                except orjson.JSONDecodeError as e:
+                    errors[block_id] = f"Invalid JSON. Error: {str(e)}"
+        elif validation_type is not None:
+            validator = _INPUT_VALIDATORS.get(validation_type.partition("-")[0])
+            # have to consider that people can pass variables, which would mess with the rest of validation,
+            # only worth scanning for them when there is a validator to skip
+            if validator is not None and not includes_slack_workflow_variable(value):
+                err_msg = validator(value, validation_type, client, min_future_ts)
+                if err_msg is not None:
+                    errors[block_id] = err_msg
+
+        # stays a plain dict - this goes straight into workflows.updateStep and comes back from Slack in the same shape
         inputs[name] = {"value": value}
 
     return inputs, errors
 
 
-def sbool(s: str) -> bool:
+def sbool(s: Optional[str]) -> bool:
     return s == "true"
 
 
@@ -876,128 +1269,130 @@ def bool_to_str(b: bool) -> str:
     return "true" if b else "false"
 
 
+# https://api.slack.com/reference/deep-linking
+_DEEPLINK_BUILDERS: Dict[str, Callable[..., str]] = {
+    "app_home": lambda team_id, **kw: f"slack://app?team={team_id}&id={kw['app_id']}&tab=home",
+    "app_home_messages": lambda team_id, **kw: f"slack://app?team={team_id}&id={kw['app_id']}&tab=messages",
+    "workspace": lambda team_id, **kw: f"slack://open?team={team_id}",
+    "channel": lambda team_id, **kw: f"slack://channel?team={team_id}&id={kw['channel_id']}",
+    "dm": lambda team_id, **kw: f"slack://user?team={team_id}&id={kw['user_id']}",
+    "file": lambda team_id, **kw: f"slack://file?team={team_id}&id={kw['file_id']}",
+    "share-file": lambda team_id, **kw: f"slack://share-file?team={team_id}&id={kw['file_id']}",
+}
+
+
 def slack_deeplink(link_type: str, team_id: str, **kwargs) -> str:
-    # https://api.slack.com/reference/deep-linking
-    if link_type == "app_home":
-        app_id = kwargs["app_id"]
-        return f"slack://app?team={team_id}&id={app_id}&tab=home"
-    elif link_type == "app_home_messages":
-        app_id = kwargs["app_id"]
-        return f"slack://app?team={team_id}&id={app_id}&tab=messages"
-    elif link_type == "workspace":
-        return f"slack://open?team={team_id}"
-    elif link_type == "channel":
-        channel_id = kwargs["channel_id"]
-        return f"slack://channel?team={team_id}&id={channel_id}"
-    elif link_type == "dm":
-        user_id = kwargs["user_id"]
-        return f"slack://user?team={team_id}&id={user_id}"
-    elif link_type == "file":
-        file_id = kwargs["file_id"]
-        return f"slack://file?team={team_id}&id={file_id}"
-    elif link_type == "share-file":
-        file_id = kwargs["file_id"]
-        return f"slack://share-file?team={team_id}&id={file_id}"
-    else:
+    build_link = _DEEPLINK_BUILDERS.get(link_type)
+    if build_link is None:
         raise ValueError("Unknown Deeplink type!")
+    return build_link(team_id, **kwargs)
+
+
+def iget(inputs: dict, key: str, default: Optional[str]) -> Optional[str]:
+    # no throwaway {"value": default} dict on a miss
+    input_obj = inputs.get(key)
+    return input_obj["value"] if input_obj is not None else default
 
 
-def iget(inputs: dict, key: str, default: str) -> str:
-    return inputs.get(key, {"value": default})["value"]
+# taken from the debug checkbox in the constants so the two can't drift apart,
+# shared between modals and never mutated
+_DEBUG_INITIAL_OPTIONS: List[Dict[str, Any]] = [
+    option
+    for block in c.UTILS_STEP_MODAL_COMMON_BLOCKS
+    if block.get("block_id") == "general_options_action_select"
+    for option in block["elements"][1]["options"]
+    if option["value"] == "debug_mode"
+]
+
+# input types whose previous value is copied straight onto a single element key
+_SIMPLE_INITIAL_VALUE_KEYS: Dict[str, str] = {
+    "conversations_select": "initial_conversation",
+    "channels_select": "initial_channel",
+    "users_select": "initial_user",
+}
 
 
 def update_blocks_with_previous_input_based_on_config(
-    blocks: list, chosen_action, existing_inputs: dict, action_config_item: dict
+    blocks: List[Dict[str, Any]],
+    chosen_action: str,
+    existing_inputs: Dict[str, Dict[str, Any]],
+    action_config_item: Dict[str, Any],
 ) -> None:
     # TODO: workflow builder keeps pulling old input on the step even when you are creating it totally new 🤔
-    # kinda a crappy way to fill out existing inputs into initial values, but fast enough
     if existing_inputs:
+        debug_enabled = sbool(iget(existing_inputs, "debug_mode_enabled", None))
+        debug_conversation_id = iget(existing_inputs, "debug_conversation_id", None)
+        # index blocks once so each input finds it's home with a single lookup
+        blocks_by_id = {block.get("block_id"): block for block in blocks}
+
+        action_select_block = blocks_by_id.get("general_options_action_select")
+        if action_select_block is not None:
+            action_select_block["elements"][0]["initial_option"] = {
+                "text": {
+                    "type": "plain_text",
+                    "text": c.UTILS_ACTION_LABELS[chosen_action],
+                    "emoji": True,
+                },
+                "value": chosen_action,
+            }
+
+            # checkboxes, just debug on it's own for now
+            if not debug_enabled:
+                logging.debug("clearing debug mode initial_options")
+                action_select_block["elements"][1].pop("initial_options", None)
+            else:
+                logging.debug("setting debug mode initial_options")
+                action_select_block["elements"][1][
+                    "initial_options"
+                ] = _DEBUG_INITIAL_OPTIONS
+
+        debug_conversation_block = blocks_by_id.get("debug_conversation_id_input")
+        if debug_conversation_block is not None:
+            debug_conversation_block["element"][
+                "initial_conversation"
+            ] = debug_conversation_id
+
+        element_key = "element"
+        input_configs = action_config_item["inputs"]
         for input_name, value_obj in existing_inputs.items():
             prev_input_value = value_obj["value"]
-            curr_input_config = action_config_item["inputs"].get(input_name)
-            # loop through blocks to find it's home
-            for block in blocks:
-                block_id = block.get("block_id")
-                if block_id == "general_options_action_select":
-                    block["elements"][0]["initial_option"] = {
-                        "text": {
-                            "type": "plain_text",
-                            "text": c.UTILS_ACTION_LABELS[chosen_action],
-                            "emoji": True,
-                        },
-                        "value": chosen_action,
-                    }
-
-                    # checkboxes, just debug on it's own for now
-                    if not sbool(
-                        existing_inputs.get("debug_mode_enabled", {}).get("value")
-                    ):
-                        print("BYE BYE")
-                        try:
-                            del block["elements"][1]["initial_options"]
-                        except KeyError:
-                            pass
-                    else:
-                        print("SETTING IT")
-                        # TODO: this breaks as soon as we change anything in the constants for it
-                        block["elements"][1]["initial_options"] = [
-                            {
-                                "text": {
-                                    "type": "mrkdwn",
-                                    "text": "🐛 *Debug Mode*",
-                                    "verbatim": False,
-                                },
-                                "value": "debug_mode",
-                                "description": {
-                                    "type": "mrkdwn",
-                                    "text": "_When enabled, Buddy will pause before each step starts, send a message, and wait for you to click `Continue`._",
-                                    "verbatim": False,
-                                },
-                            }
-                        ]
-                elif block_id == "debug_conversation_id_input":
-                    debug_conversation_id = existing_inputs.get(
-                        "debug_conversation_id", {}
-                    ).get("value")
-                    block["element"]["initial_conversation"] = debug_conversation_id
+            curr_input_config = input_configs.get(input_name)
+            if not curr_input_config:
+                continue
+            cfg_type = curr_input_config.get("type")
+            cfg_block_id = curr_input_config.get("block_id")
+            if cfg_block_id in (
+                "general_options_action_select",
+                "debug_conversation_id_input",
+            ):
+                # handled above
+                continue
+            block = blocks_by_id.get(cfg_block_id)
+            if block is None:
+                continue
+            # add initial placeholder info
+            initial_key = _SIMPLE_INITIAL_VALUE_KEYS.get(cfg_type)
+            if initial_key is not None:
+                block[element_key][initial_key] = prev_input_value
+            elif cfg_type == "static_select":
+                block[element_key]["initial_option"] = {
+                    "text": {
+                        "type": "plain_text",
+                        "text": curr_input_config.get("label", {}).get(prev_input_value)
+                        or prev_input_value.upper(),
+                        "emoji": True,
+                    },
+                    "value": prev_input_value,
+                }
+            elif cfg_type == "checkboxes":
+                initial_options = orjson.loads(prev_input_value)
+                if len(initial_options) < 1:
+                    block[element_key].pop("initial_options", None)
                 else:
-                    element_key = "element"
-                    if curr_input_config and (
-                        block_id == curr_input_config.get("block_id")
-                    ):
-                        # add initial placeholder info
-                        if curr_input_config.get("type") == "conversations_select":
-                            block[element_key][
-                                "initial_conversation"
-                            ] = prev_input_value
-                        elif curr_input_config.get("type") == "channels_select":
-                            block[element_key]["initial_channel"] = prev_input_value
-                        elif curr_input_config.get("type") == "static_select":
-                            block[element_key]["initial_option"] = {
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": curr_input_config.get("label", {}).get(
-                                        prev_input_value
-                                    )
-                                    or prev_input_value.upper(),
-                                    "emoji": True,
-                                },
-                                "value": prev_input_value,
-                            }
-                        elif curr_input_config.get("type") == "users_select":
-                            block[element_key]["initial_user"] = prev_input_value
-                        elif curr_input_config.get("type") == "checkboxes":
-                            initial_options = json.loads(prev_input_value)
-                            if len(initial_options) < 1:
-                                try:
-                                    del block[element_key]["initial_options"]
-                                except KeyError:
-                                    pass
-                            else:
-                                block["element"]["initial_options"] = initial_options
-                        else:
-                            # assume plain_text_input cuz it's common
-                            block["element"]["initial_value"] = prev_input_value or ""
+                    block[element_key]["initial_options"] = initial_options
+            else:
+                # assume plain_text_input cuz it's common
+                block[element_key]["initial_value"] = prev_input_value or ""
     else:
         logging.debug(
             "No previous inputs to reload, anything you see is happening because of bad coding."
@@ -1,9 +1,21 @@
+import atexit
 import os
+import shutil
+import tempfile
 
 import pytest
 
 print("Run conftest")
 
+# buddy.utils reads these at import time, and conftest is imported first.
+# a fresh temp dir per run keeps the persisted db out of the repo and stops runs leaking state into each other
+os.environ.setdefault("ENV", "TEST")
+if not os.environ.get("WB_DATA_DIR"):
+    _test_data_dir = tempfile.mkdtemp(prefix="workflow-buddy-test-")
+    os.environ["WB_DATA_DIR"] = _test_data_dir
+    # registered before buddy.utils is imported, so this runs after its own exit flush
+    atexit.register(shutil.rmtree, _test_data_dir, ignore_errors=True)
+
 # doesn't work because we need them at import time
 # @pytest.fixture(scope='module', autouse=True)
 # def test_env_vars(monkeypatch):
@@ -1,11 +1,17 @@
+import copy
+import http.server
 import json
 import logging
+import threading
+import time
 import unittest.mock as mock
 from typing import List
+from urllib import parse
 
 import pytest
 import slack_sdk.errors
 
+import buddy.constants as c
 import buddy.utils as sut
 import tests.tc as test_const
 
@@ -16,6 +22,7 @@ class FakeResponse:
     def __init__(self, status_code, body) -> None:
         self.status_code = status_code
         self.body = body
+        self.text = json.dumps(body)
 
 
 SLACK_WORKFLOW_BUILDER_WEBHOOK_VARIABLES_MAX = 20
@@ -51,7 +58,14 @@ def test_is_valid_slack_channel_name_happy_path():
     # Channel names may only contain lowercase letters, numbers, hyphens, underscores and be max 80 chars.
     name = "acceptable-channel-name_1"
     is_valid = sut.is_valid_slack_channel_name(name)
-    assert not is_valid
+    assert is_valid
+
+
+@pytest.mark.parametrize(
+    "name", ["", "UPPER-case", "no.dots", "emoji-🎉", "trailing-newline\n"]
+)
+def test_is_valid_slack_channel_name_rejects_disallowed_chars(name):
+    assert not sut.is_valid_slack_channel_name(name)
 
 
 def test_is_valid_url_happy_path_http():
@@ -159,6 +173,10 @@ def test_flatten_payload(name, event):
             "I am a value with {{65591853-edfe-4721-856d-ecd157766461==user.name}} in it",
             True,
         ),
+        (
+            "Multi-line value\nwith {{65591853-edfe-4721-856d-ecd157766461==user.name}} in it",
+            True,
+        ),
         ("abc@example.com", False),
         ("5", False),
         (None, False),
@@ -179,6 +197,24 @@ def test_generic_event_proxy(patched_send, name, event):
     sut.generic_event_proxy(test_logger, event, {})
 
 
+@mock.patch("buddy.utils.send_webhook")
+def test_generic_event_proxy_sends_to_every_webhook(patched_send):
+    event_type = "test_fan_out_event"
+    urls = [f"https://example.com/hook/{i}" for i in range(3)]
+    patched_send.side_effect = [
+        FakeResponse(201, {}),
+        FakeResponse(500, {}),
+        FakeResponse(201, {}),
+    ]
+    sut.db_import({event_type: [{"webhook_url": url} for url in urls]})
+    try:
+        sut.generic_event_proxy(test_logger, {"type": event_type}, {})
+    finally:
+        sut.db_remove_event(event_type)
+    sent_urls = [call.args[0] for call in patched_send.call_args_list]
+    assert sorted(sent_urls) == urls
+
+
 @pytest.mark.parametrize(
     "input_json_str, expected_result",
     [
@@ -263,6 +299,13 @@ def test_sanitizing_unescaped_quotes(
             raise err
 
 
+def test_sanitizing_unescaped_quotes_keeps_value_intact():
+    out = sut.sanitize_unescaped_quotes_and_load_json_str(
+        '{"key": "say "hi" now", "other": "plain"}'
+    )
+    assert out == {"key": 'say "hi" now', "other": "plain"}
+
+
 def test_dynamic_outputs_random_member():
     action_name = "random_member_picker"
     inputs = {"number_of_users": {"value": "3"}}
@@ -300,18 +343,44 @@ def test_sample_list_until_no_bots_are_found(
         if error_expected:
             pytest.fail("Yikes! expected an error to occur but none did.")
         assert len(set(users)) == num_users
-    except IndexError as e:
+    except ValueError as e:
         if not error_expected:
             raise e
 
 
+def test_filter_bots_caches_bot_status():
+    mock_client = mock.MagicMock()
+    mock_client.users_info.side_effect = [
+        {"ok": True, "user": {"is_bot": True}},
+        {"ok": True, "user": {"is_bot": False}},
+    ]
+    members = ["bot_user1", "user2"]
+    assert sut.filter_bots(mock_client, members) == ["user2"]
+    assert sut.filter_bots(mock_client, members) == ["user2"]
+    assert mock_client.users_info.call_count == 2
+
+
+def test_sample_list_until_no_bots_are_found_only_bots():
+    mock_client = mock.MagicMock()
+    mock_client.users_info.return_value = {"ok": True, "user": {"is_bot": True}}
+    with pytest.raises(ValueError):
+        sut.sample_list_until_no_bots_are_found(mock_client, ["bot1", "bot2"], 1)
+
+
+@pytest.mark.parametrize("members", [[], ["U1", "U2"]])
+def test_sample_list_until_no_bots_are_found_zero_users(members):
+    mock_client = mock.MagicMock()
+    assert sut.sample_list_until_no_bots_are_found(mock_client, members, 0) == []
+    mock_client.users_info.assert_not_called()
+
+
 def test_finish_step_execution_from_webhook():
     json_body = {
         "execution_id": "1132323232322",
         "sk": "1" * 20,
         "mark_as_failed": True,
     }
-    with mock.patch("buddy.utils.slack_sdk.WebClient") as mock_class:
+    with mock.patch("buddy.utils._slack_client") as mock_class:
         # https://stackoverflow.com/questions/17731477/python-mock-class-instance-variable#17731909
         # instance = mock_class.return_value
         # instance.workflows_stepCompleted.return_value =
@@ -327,7 +396,7 @@ def test_finish_step_execution_from_webhook_api_error():
         "mark_as_failed": True,
         "err_msg": "Something blew up in external service.",
     }
-    with mock.patch("buddy.utils.slack_sdk.WebClient") as mock_class:
+    with mock.patch("buddy.utils._slack_client") as mock_class:
         # https://stackoverflow.com/questions/17731477/python-mock-class-instance-variable#17731909
         instance = mock_class.return_value
         slack_error = slack_sdk.errors.SlackApiError("slack boom", {"error": "errmsg"})
@@ -345,10 +414,140 @@ def test_sbool(bool_str, expected):
     assert out == expected
 
 
-@pytest.mark.skip()
 def test_parse_values_from_input_config():
-    # TODO: can create more confidence in this now that it's moved here for unit tests than in app
-    pass
+    curr_action_config = {
+        "inputs": {
+            "channel": {"block_id": "b1", "action_id": "a1", "type": "channels_select"},
+            "flags": {"block_id": "b2", "action_id": "a2", "type": "checkboxes"},
+            "method": {"block_id": "b3", "action_id": "a3", "type": "static_select"},
+            "url": {"block_id": "b4", "action_id": "a4", "validation_type": "url"},
+            "short": {
+                "block_id": "b5",
+                "action_id": "a5",
+                "validation_type": "str_length-5",
+            },
+            "post_at": {
+                "block_id": "b6",
+                "action_id": "a6",
+                "validation_type": "future_timestamp",
+            },
+            "name": {
+                "block_id": "b7",
+                "action_id": "a7",
+                "validation_type": "slack_channel_name",
+            },
+            "var_url": {"block_id": "b8", "action_id": "a8", "validation_type": "url"},
+        }
+    }
+    values = {
+        "b1": {"a1": {"selected_channel": "C123"}},
+        "b2": {"a2": {"selected_options": [{"value": "fail_on_http_error"}]}},
+        "b3": {"a3": {"selected_option": {"value": "POST"}}},
+        "b4": {"a4": {"value": "not a url"}},
+        "b5": {"a5": {"value": "too long"}},
+        "b6": {"a6": {"value": "abc"}},
+        "b7": {"a7": {"value": "good-name"}},
+        "b8": {"a8": {"value": "{{65591853-edfe-4721-856d-ecd157766461==url}}"}},
+    }
+    inputs, errors = sut.parse_values_from_input_config(
+        mock.MagicMock(), values, {}, curr_action_config
+    )
+    assert inputs["channel"]["value"] == "C123"
+    assert json.loads(inputs["flags"]["value"]) == [{"value": "fail_on_http_error"}]
+    assert inputs["method"]["value"] == "POST"
+    assert inputs["name"]["value"] == "good-name"
+    assert set(errors.keys()) == {"b4", "b5", "b6"}
+
+
+@pytest.mark.parametrize(
+    "validation_type, value, membership, has_error",
+    [
+        ("integer", "12", None, False),
+        ("integer-200", "201", None, True),
+        ("integer", "abc", None, True),
+        ("email", "a@b.co", None, False),
+        ("email", "nope", None, True),
+        ("membership_check", "C1", "not_member_but_public", True),
+        ("msg_check", "C1", "not_member_but_public", False),
+        ("msg_check", "C1", "not_in_convo", True),
+        ("future_timestamp", "4102444800", None, False),
+        ("future_timestamp", " 4102444800 ", None, False),
+        ("future_timestamp", "12", None, True),
+        ("future_timestamp", "-5", None, True),
+        ("future_timestamp", "", None, True),
+        ("future_timestamp", "1700000000abc", None, True),
+        ("future_timestamp", "²", None, True),
+        ("future_timestamp", "-1000000000000", None, True),
+        ("future_timestamp", " -1000000000000 ", None, True),
+        ("future_timestamp", "-99999999999999999999", None, True),
+        ("future_timestamp", "+4102444800", None, False),
+        ("unknown_type", "anything", None, False),
+    ],
+)
+def test_parse_values_from_input_config_validators(
+    validation_type, value, membership, has_error
+):
+    curr_action_config = {
+        "inputs": {
+            "x": {
+                "block_id": "b1",
+                "action_id": "a1",
+                "validation_type": validation_type,
+            }
+        }
+    }
+    values = {"b1": {"a1": {"value": value}}}
+    with mock.patch(
+        "buddy.utils.cached_test_if_bot_is_member", return_value=membership
+    ):
+        inputs, errors = sut.parse_values_from_input_config(
+            mock.MagicMock(), values, {}, curr_action_config
+        )
+    assert inputs["x"]["value"] == value
+    assert ("b1" in errors) == has_error
+
+
+def test_parse_values_from_input_config_skips_variable_scan_without_validator():
+    curr_action_config = {
+        "inputs": {
+            "plain": {"block_id": "b1", "action_id": "a1"},
+            "email": {"block_id": "b2", "action_id": "a2", "validation_type": "email"},
+        }
+    }
+    wf_var = "{{65591853-edfe-4721-856d-ecd157766461==user.email}}"
+    values = {"b1": {"a1": {"value": "hi"}}, "b2": {"a2": {"value": wf_var}}}
+    with mock.patch(
+        "buddy.utils.includes_slack_workflow_variable",
+        wraps=sut.includes_slack_workflow_variable,
+    ) as spy:
+        inputs, errors = sut.parse_values_from_input_config(
+            mock.MagicMock(), values, {}, curr_action_config
+        )
+    spy.assert_called_once_with(wf_var)
+    assert errors == {}
+    assert inputs["email"]["value"] == wf_var
+
+
+@pytest.mark.parametrize(
+    "validation_type, expected",
+    [
+        ("str_length-250", 250),
+        ("str_length-5", 5),
+        ("str_length", None),
+        ("str_length-abc", None),
+        ("str_length-5-10", None),
+        ("url", None),
+    ],
+)
+def test_parse_str_length(validation_type, expected):
+    assert sut._parse_str_length(validation_type) == expected
+
+
+def test_iget():
+    inputs = {"present": {"value": "v"}, "empty": {"value": ""}}
+    assert sut.iget(inputs, "present", "default") == "v"
+    assert sut.iget(inputs, "empty", "default") == ""
+    assert sut.iget(inputs, "missing", "default") == "default"
 
 
 def test_slack_deeplink():
@@ -356,3 +555,297 @@ def test_slack_deeplink():
     app_id = "A123445"
     app_home_deeplink = sut.slack_deeplink("app_home", team_id, app_id=app_id)
     assert team_id in app_home_deeplink and app_id in app_home_deeplink
+
+
+def test_build_app_home_view_rebuilt_after_db_change():
+    event_type = "test_app_home_cache_event"
+    with mock.patch.object(sut, "_app_home_body_cache", None), mock.patch(
+        "buddy.utils._build_app_home_body_blocks",
+        wraps=sut._build_app_home_body_blocks,
+    ) as build_body:
+        try:
+            sut.build_app_home_view()
+            sut.build_app_home_view()
+            assert build_body.call_count == 1
+
+            sut.db_import({event_type: [{"webhook_url": "https://example.com"}]})
+            updated = sut.build_app_home_view()
+            sut.build_app_home_view()
+            assert build_body.call_count == 2
+            assert any(event_type in str(block) for block in updated["blocks"])
+        finally:
+            sut.db_remove_event(event_type)
+        removed = sut.build_app_home_view()
+        assert build_body.call_count == 3
+    assert not any(event_type in str(block) for block in removed["blocks"])
+
+
+def test_db_unhandled_event_recorded_once_and_removed():
+    event_type = "test_unhandled_event"
+    sut.db_set_unhandled_event(event_type)
+    sut.db_set_unhandled_event(event_type)
+    assert sut.db_get_unhandled_events().count(event_type) == 1
+    sut.db_remove_unhandled_event(event_type)
+    assert event_type not in sut.db_get_unhandled_events()
+
+
+def test_get_block_kit_builder_link_round_trips_payload():
+    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": "héllo & #1"}}]
+    link = sut.get_block_kit_builder_link(blocks=blocks)
+    base_url, quoted_json = link.split("#", 1)
+    assert base_url == "https://app.slack.com/block-kit-builder/"
+    assert json.loads(parse.unquote(quoted_json)) == {"type": "home", "blocks": blocks}
+
+
+def test_cached_test_if_bot_is_member_only_caches_membership():
+    mock_client = mock.MagicMock()
+    mock_client.conversations_info.side_effect = [
+        {"channel": {"is_member": False, "is_channel": True, "is_private": True}},
+        {"channel": {"is_member": True}},
+    ]
+    conversation_id = "C_TEST_MEMBERSHIP"
+    sut.invalidate_membership_cache(conversation_id)
+    statuses = [
+        sut.cached_test_if_bot_is_member(conversation_id, mock_client) for _ in range(3)
+    ]
+    assert statuses == ["not_in_convo", "is_member", "is_member"]
+    assert mock_client.conversations_info.call_count == 2
+    sut.invalidate_membership_cache(conversation_id)
+    assert conversation_id not in sut._membership_cache
+
+
+def test_cached_test_if_bot_is_member_reads_cache_once():
+    class DroppedAfterGet(dict):
+        # another thread invalidating right after the lookup shows up as a missing key on re-index
+        def __getitem__(self, key):
+            raise KeyError(key)
+
+    mock_client = mock.MagicMock()
+    cache = DroppedAfterGet(C_RACE=time.monotonic())
+    with mock.patch.object(sut, "_membership_cache", cache):
+        assert sut.cached_test_if_bot_is_member("C_RACE", mock_client) == "is_member"
+    mock_client.conversations_info.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "link_type, kwargs, expected",
+    [
+        ("workspace", {}, "slack://open?team=T1"),
+        ("channel", {"channel_id": "C1"}, "slack://channel?team=T1&id=C1"),
+        ("dm", {"user_id": "U1"}, "slack://user?team=T1&id=U1"),
+        ("share-file", {"file_id": "F1"}, "slack://share-file?team=T1&id=F1"),
+    ],
+)
+def test_slack_deeplink_types(link_type, kwargs, expected):
+    assert sut.slack_deeplink(link_type, "T1", **kwargs) == expected
+
+
+def test_slack_deeplink_unknown_type():
+    with pytest.raises(ValueError):
+        sut.slack_deeplink("not_a_link_type", "T1")
+
+
+SPECIAL_UTILS_BLOCK_IDS = {
+    "general_options_action_select",
+    "debug_conversation_id_input",
+}
+
+
+def _utils_step_blocks(action: str) -> list:
+    blocks = copy.deepcopy(c.UTILS_STEP_MODAL_COMMON_BLOCKS)
+    blocks.extend(copy.deepcopy(c.DEBUG_MODE_BLOCKS))
+    blocks.extend(copy.deepcopy(c.UTILS_CONFIG[action]["modal_input_blocks"]))
+    return blocks
+
+
+def _find_block(blocks: list, block_id: str) -> dict:
+    return next(b for b in blocks if b.get("block_id") == block_id)
+
+
+def test_update_blocks_with_previous_input_based_on_config():
+    blocks = _utils_step_blocks("webhook")
+    existing_inputs = {
+        "selected_utility": {"value": "webhook"},
+        "debug_mode_enabled": {"value": "true"},
+        "debug_conversation_id": {"value": "C_DEBUG"},
+        "webhook_url": {"value": "https://example.com"},
+        "bool_flags": {"value": '[{"value": "fail_on_http_error"}]'},
+        "http_method": {"value": "post"},
+        "request_json_str": {"value": None},
+        "legacy_input_not_in_config": {"value": "ignored"},
+    }
+    sut.update_blocks_with_previous_input_based_on_config(
+        blocks, "webhook", existing_inputs, c.UTILS_CONFIG["webhook"]
+    )
+    action_select = _find_block(blocks, "general_options_action_select")
+    assert action_select["elements"][0]["initial_option"]["value"] == "webhook"
+    debug_checkbox = action_select["elements"][1]
+    assert debug_checkbox["initial_options"] == debug_checkbox["options"]
+    debug_block = _find_block(blocks, "debug_conversation_id_input")
+    assert debug_block["element"]["initial_conversation"] == "C_DEBUG"
+    url_block = _find_block(blocks, "webhook_url_input")
+    assert url_block["element"]["initial_value"] == "https://example.com"
+    flags_block = _find_block(blocks, "block_checkboxes")
+    assert flags_block["element"]["initial_options"] == [
+        {"value": "fail_on_http_error"}
+    ]
+    method_block = _find_block(blocks, "http_method_action_select")
+    assert method_block["element"]["initial_option"]["value"] == "post"
+    assert method_block["element"]["initial_option"]["text"]["text"] == "POST"
+    request_block = _find_block(blocks, "request_json_str_input")
+    assert request_block["element"]["initial_value"] == ""
+
+
+def test_update_blocks_with_previous_input_ignores_inputs_without_config():
+    blocks = _utils_step_blocks("webhook")
+    untouched = copy.deepcopy(
+        [b for b in blocks if b.get("block_id") not in SPECIAL_UTILS_BLOCK_IDS]
+    )
+    existing_inputs = {
+        "debug_mode_enabled": {"value": "true"},
+        "debug_conversation_id": {"value": "C_DEBUG"},
+        "legacy_input_not_in_config": {"value": "ignored"},
+    }
+    sut.update_blocks_with_previous_input_based_on_config(
+        blocks, "webhook", existing_inputs, c.UTILS_CONFIG["webhook"]
+    )
+    assert [
+        b for b in blocks if b.get("block_id") not in SPECIAL_UTILS_BLOCK_IDS
+    ] == untouched
+    debug_block = _find_block(blocks, "debug_conversation_id_input")
+    assert debug_block["element"]["initial_conversation"] == "C_DEBUG"
+
+
+def test_update_blocks_with_previous_input_clears_unset_options():
+    blocks = _utils_step_blocks("webhook")
+    action_select = _find_block(blocks, "general_options_action_select")
+    action_select["elements"][1]["initial_options"] = ["stale"]
+    flags_block = _find_block(blocks, "block_checkboxes")
+    flags_block["element"]["initial_options"] = ["stale"]
+    existing_inputs = {
+        "debug_mode_enabled": {"value": "false"},
+        "bool_flags": {"value": "[]"},
+    }
+    sut.update_blocks_with_previous_input_based_on_config(
+        blocks, "webhook", existing_inputs, c.UTILS_CONFIG["webhook"]
+    )
+    assert "initial_options" not in action_select["elements"][1]
+    assert "initial_options" not in flags_block["element"]
+
+
+def test_sync_cache_to_disk_during_concurrent_mutation():
+    started_mutation = threading.Event()
+    mutator = threading.Thread(
+        target=sut.db_add_webhook_to_event,
+        args=("test_compaction_added_event", "n", "https://example.com", "U1"),
+    )
+
+    class MutatesWhileCopied(list):
+        def __iter__(self):
+            # runs while the snapshot is being built, with _flush_lock held. The mutator
+            # changes the dict straight away, then blocks on the lock for its log append
+            if not started_mutation.is_set():
+                started_mutation.set()
+                mutator.start()
+                deadline = time.monotonic() + 5
+                while (
+                    "test_compaction_added_event"
+                    not in sut.IN_MEMORY_WRITE_THROUGH_CACHE
+                    and time.monotonic() < deadline
+                ):
+                    time.sleep(0.001)
+            return super().__iter__()
+
+    sut.IN_MEMORY_WRITE_THROUGH_CACHE[
+        "test_compaction_slow_event"
+    ] = MutatesWhileCopied(
+        [{"name": "n", "webhook_url": "https://example.com", "added_by": "U1"}]
+    )
+    try:
+        sut.sync_cache_to_disk()
+        mutator.join(timeout=5)
+        assert not mutator.is_alive()
+        assert "test_compaction_added_event" in sut.IN_MEMORY_WRITE_THROUGH_CACHE
+    finally:
+        sut.db_remove_event("test_compaction_slow_event")
+        sut.db_remove_event("test_compaction_added_event")
+
+
+def test_compaction_worker_survives_unexpected_errors():
+    class StopWorker(BaseException):
+        pass
+
+    # first pass blows up inside compaction, second pass proves the loop kept going
+    with mock.patch.object(sut, "_dirty") as dirty, mock.patch.object(
+        sut, "WB_FLUSH_DEBOUNCE_MS", 0
+    ), mock.patch.object(sut, "WB_OPLOG_COMPACT_BYTES", -1), mock.patch.object(
+        sut, "sync_cache_to_disk", side_effect=[RuntimeError("boom"), StopWorker()]
+    ) as sync:
+        dirty.wait.return_value = True
+        with pytest.raises(StopWorker):
+            sut._compaction_worker()
+    assert sync.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "contents, expected",
+    [
+        (b"", b""),
+        (b'{"op":"del","k":"x"}\n', b'{"op":"del","k":"x"}\n'),
+        (
+            b'{"op":"del","k":"x"}\n{"op":"put","k":"a","v":[1',
+            b'{"op":"del","k":"x"}\n',
+        ),
+        (b'{"op":"put","k":"a","v":[1', b""),
+        (b"x" * 10000, b""),
+        (b"ok\n" + b"x" * 10000, b"ok\n"),
+    ],
+)
+def test_repair_torn_oplog_tail(tmp_path, contents, expected):
+    log_path = tmp_path / "db.log"
+    log_path.write_bytes(contents)
+    sut._repair_torn_oplog_tail(str(log_path))
+    assert log_path.read_bytes() == expected
+
+
+def test_append_after_torn_oplog_tail_survives_replay(tmp_path):
+    log_path = tmp_path / "db.log"
+    log_path.write_bytes(b'{"op":"put","k":"a","v":[1')
+    sut._repair_torn_oplog_tail(str(log_path))
+    with open(log_path, "ab") as lf:
+        lf.write(b'{"op":"put","k":"test_torn_tail_event","v":[{"name":"n"}]}\n')
+    try:
+        assert sut._replay_oplog(str(log_path)) == 1
+        assert sut.IN_MEMORY_WRITE_THROUGH_CACHE["test_torn_tail_event"] == [
+            {"name": "n"}
+        ]
+    finally:
+        sut.db_remove_event("test_torn_tail_event")
+
+
+def test_shared_http_session_does_not_keep_cookies():
+    seen_cookie_headers = []
+
+    class SetsCookie(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen_cookie_headers.append(self.headers.get("Cookie"))
+            self.send_response(200)
+            self.send_header("Set-Cookie", "session=secret; Path=/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), SetsCookie)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/"
+        for _ in range(2):
+            assert sut._HTTP.get(url, timeout=5).status_code == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert seen_cookie_headers == [None, None]
+    assert len(sut._HTTP.cookies) == 0